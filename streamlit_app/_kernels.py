@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Numba kernels for the Streamlit app's hot loops.
+
+Reproduce utils.strategies.rsi and the trades of backtest_simple_strategy
+exactly, so the app and batch backtester stay consistent.
+"""
+
+import numpy as np
+from numba import njit
+
+MODE_IDS = {"mean_reversion": 0, "overbought_reversal": 1, "trend_follow_rsi": 2}
+
+
+@njit(cache=True, nogil=True)
+def rsi_wilder(close, period):
+    # Same recursion as pandas ewm(alpha=1/period, adjust=False); bar 0 has no delta
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    alpha = 1.0 / period
+    ma_up, ma_down = 0.0, 0.0
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        up = delta if delta > 0 else 0.0
+        down = -delta if delta < 0 else 0.0
+        if i == 1:
+            ma_up, ma_down = up, down
+        else:
+            ma_up = (1 - alpha) * ma_up + alpha * up
+            ma_down = (1 - alpha) * ma_down + alpha * down
+        out[i] = 100 - (100 / (1 + ma_up / (ma_down + 1e-9)))
+    return out
+
+
+def event_indices(rsi, thr, direction):
+    # Bars where RSI enters the region above (direction > 0) or below (direction < 0) thr
+    inside = rsi > thr if direction > 0 else rsi < thr
+    return inside, _run_starts(inside)
+
+
+def _run_starts(inside):
+    return np.flatnonzero(np.diff(inside.view(np.int8)) > 0) + 1
+
+
+@njit(cache=True, nogil=True)
+def _next_event(inside, starts, pos):
+    # First bar >= pos where inside holds; it is either pos itself or a run start
+    if pos >= inside.shape[0]:
+        return -1
+    if inside[pos]:
+        return pos
+    k = np.searchsorted(starts, pos)
+    return starts[k] if k < starts.shape[0] else -1
+
+
+@njit(cache=True, nogil=True)
+def _walk_events(last_ok, long_in, long_st, long_out, long_out_st,
+                 short_in, short_st, short_out, short_out_st):
+    n = long_in.shape[0]
+    # A trade spans at least two bars (bar 0 never trades, only the last may be
+    # force-closed on entry), so n // 2 + 1 slots always suffice
+    max_trades = n // 2 + 1
+    entry_idx = np.empty(max_trades, dtype=np.int32)
+    exit_idx = np.empty(max_trades, dtype=np.int32)
+    side = np.empty(max_trades, dtype=np.int8)
+    k, pos = 0, 1
+
+    while pos < n:
+        le = _next_event(long_in, long_st, pos)
+        se = _next_event(short_in, short_st, pos)
+        if le < 0 and se < 0:
+            break
+        if se < 0 or (0 <= le < se):
+            entry, sd = le, 1
+            exit_ = _next_event(long_out, long_out_st, entry + 1)
+        else:
+            entry, sd = se, -1
+            exit_ = _next_event(short_out, short_out_st, entry + 1)
+        if exit_ < 0:
+            # Open positions are closed on the last bar, as in the per-bar loop
+            if not last_ok:
+                break
+            exit_ = n - 1
+        entry_idx[k], exit_idx[k], side[k] = entry, exit_, sd
+        k += 1
+        pos = exit_ + 1
+
+    return entry_idx[:k], exit_idx[:k], side[:k]
+
+
+def backtest_mode(rsi, mode_id, lower, upper, exit_level):
+    # Returns entry/exit bar indices and side (+1 long, -1 short) per trade; only
+    # threshold crossings are walked, the per-bar conditions are numpy masks
+    never = np.zeros(rsi.shape[0], dtype=np.bool_)
+    no_starts = _run_starts(never)
+    if mode_id == 0:
+        events = (*event_indices(rsi, lower, -1), *event_indices(rsi, exit_level, 1), never, no_starts, never, no_starts)
+    elif mode_id == 1:
+        events = (never, no_starts, never, no_starts, *event_indices(rsi, upper, 1), *event_indices(rsi, exit_level, -1))
+    else:
+        prev = np.concatenate((np.array([np.nan]), rsi[:-1]))
+        cross_up = (prev < 50) & (rsi > 50)
+        cross_down = (prev > 50) & (rsi < 50)
+        events = (cross_up, _run_starts(cross_up), *event_indices(rsi, 50, -1),
+                 cross_down, _run_starts(cross_down), *event_indices(rsi, 50, 1))
+    return _walk_events(rsi.shape[0] > 0 and not np.isnan(rsi[-1]), *events)
+
+
+@njit(cache=True, nogil=True)
+def lttb(x, y, n_out):
+    # Indices of the points Largest-Triangle-Three-Buckets keeps out of len(x)
+    n = x.shape[0]
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[n_out - 1] = 0, n - 1
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    for i in range(n_out - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        nxt_hi = min(int((i + 2) * every) + 1, n)
+        avg_x = x[hi:nxt_hi].mean()
+        avg_y = y[hi:nxt_hi].mean()
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep[i + 1] = best
+        a = best
+    return keep
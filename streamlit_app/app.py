@@ -8,23 +8,29 @@ RSI Strategy Analyzer (Portfolio Version)
 """
 
 import time
+import random
+import asyncio
+import requests
 import streamlit as st
 import pandas as pd
 import numpy as np
 import yfinance as yf
 import plotly.graph_objs as go
 import os
+from functools import cache, partial
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from joblib import Parallel, delayed
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-from utils.strategies import (
-    rsi,
-    compute_returns_from_trades,
-    backtest_simple_strategy,
-    tag_market_regime,
-)
+from utils.strategies import summarize_trades, tag_market_regime
+from _kernels import MODE_IDS, rsi_wilder, backtest_mode, lttb
 
 
 SAVE_OUTPUTS = False  # prevent writing to local disk
+CHART_POINTS = 2000  # LTTB target for line traces; a wide chart can't show more
+SWEEP_RSI_PERIODS = [7, 14, 21]  # Mean Reversion sensitivity grid
+SWEEP_LOWER_THRESHOLDS = [20, 25, 30, 35]
 st.set_page_config(layout="wide", page_title="RSI Strategy Analyzer")
 
 
@@ -32,45 +38,145 @@ st.set_page_config(layout="wide", page_title="RSI Strategy Analyzer")
 # Settings
 # -------------------------
 
-@st.cache_data
+@st.cache_resource
+def _yf_session():
+    # One pooled session shared by every fetch; freshness is left to the fetch cache,
+    # so retries always hit Yahoo rather than a cached bad response
+    return requests.Session()
 
 
-@st.cache_data(ttl=3600)  # cache for 1 hour
-def fetch_data_yfinance(ticker, period="60d", interval="1h"):
+async def _fetch_async(ticker, period, interval):
     last_err = None
+    session = _yf_session()  # resolve on the script thread, not inside to_thread
 
     for attempt in range(4):  
         try:
-            df = yf.download(
+            df = await asyncio.to_thread(
+                yf.download,
                 ticker,
                 period=period,
                 interval=interval,
                 progress=False,
                 auto_adjust=True,
                 threads=False,
+                session=session,
             )
             
             if df is None or df.empty:
                 raise ValueError("Empty dataframe returned (possible rate limit).")
 
-            df = df.dropna()
-            df["timestamp"] = df.index
-
-            
-            if "Volume" not in df.columns:
-                df["Volume"] = 0
-
-            df = df[["Open", "High", "Low", "Close", "Volume", "timestamp"]]
-            df.columns = ["open", "high", "low", "close", "volume", "timestamp"]
-            return df
+            # One chain: a missing Volume column is filled with 0 by reindex.
+            # Close stays float64 since it drives RSI, PnL and the trade log prices;
+            # the unused open/high/low are downcast to slim the disk cache.
+            return (
+                df.rename(columns={"Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"})
+                .reindex(columns=["open", "high", "low", "close", "volume"], fill_value=0)
+                .dropna()
+                .astype({"open": "float32", "high": "float32", "low": "float32", "close": "float64"})
+                .assign(volume=lambda d: pd.to_numeric(d["volume"], downcast="unsigned"))
+            )
 
         except Exception as e:
             last_err = e
-            time.sleep(1.5 * (attempt + 1))  
+            if attempt < 3:
+                # Exponential backoff with jitter: ~1.75s worst case instead of 15s
+                await asyncio.sleep(min(0.25 * 2 ** attempt, 4.0) + random.random() * 0.1)
 
     raise RuntimeError(f"Yahoo fetch failed after retries: {last_err}")
 
 
+# Disk-persisted caches ignore ttl, so callers pass the current hour to expire entries
+@st.cache_data(persist="disk", max_entries=32, show_spinner=False)
+def fetch_data_yfinance(ticker, period="60d", interval="1h", cache_hour=None):
+    return asyncio.run(_fetch_async(ticker, period, interval))
+
+
+@st.cache_resource
+def _fetch_bucket():
+    return {"hour": None}
+
+
+def _current_fetch_hour():
+    # Disk-persisted caches never evict files, so last hour's pickles are dropped when
+    # the hour turns over; after a restart, stale files go at the next turnover
+    hour = int(time.time() // 3600)
+    bucket = _fetch_bucket()
+    if bucket["hour"] != hour:
+        if bucket["hour"] is not None:
+            fetch_data_yfinance.clear()
+        bucket["hour"] = hour
+    return hour
+
+
+@st.cache_resource
+def _warm_kernels():
+    # Compile (or load numba's on-disk cache) once per process, not on a user's first rerun
+    sample = np.frombuffer(np.linspace(1.0, 2.0, 64).tobytes(), dtype=np.float64)
+    backtest_mode(np.frombuffer(rsi_wilder(sample, 14).tobytes(), dtype=np.float64), 0, 30, 70, 50)
+    lttb(sample.copy(), sample.copy(), 8)
+
+
+@st.cache_data(ttl=3600)
+def _rsi_cached(close_bytes: bytes, n: int, period: int) -> np.ndarray:
+    # Raw bytes hash far cheaper than a Series, so threshold sliders stay cache hits
+    return rsi_wilder(np.frombuffer(close_bytes, dtype=np.float64, count=n), period)
+
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def _bt_cached(close: bytes, rsi_arr: bytes, mode: str, lower: int, upper: int, exit_level: int) -> tuple[dict, tuple]:
+    # Keys stay bytes-only: trades come back as bar indices, timestamped in _trades_frame
+    close_a = np.frombuffer(close, dtype=np.float64)
+    rsi_a = np.frombuffer(rsi_arr, dtype=np.float64)
+    entries, exits, sides = backtest_mode(rsi_a, MODE_IDS[mode], lower, upper, exit_level)
+    pnl = sides * (close_a[exits] / close_a[entries] - 1) * 100
+    return summarize_trades(pd.DataFrame({"pnl_pct": pnl})), (entries, exits, sides)
+
+
+def _trades_frame(index, close, entries, exits, sides):
+    # Every column is one fancy-index over the preallocated kernel outputs
+    entry_price, exit_price = close[entries], close[exits]
+    trades_df = pd.DataFrame({
+        "entry_time": index[entries],
+        "exit_time": index[exits],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "side": np.where(sides > 0, "long", "short"),
+        "pnl_pct": sides * (exit_price / entry_price - 1) * 100,
+    })
+    trades_df["cumulative_pnl_pct"] = trades_df["pnl_pct"].cumsum()
+    return trades_df
+
+
+def _sweep_one(close, period, lower, exit_level):
+    # Bar 0 has no RSI and is dropped, exactly as in the main backtest path
+    rsi_a, close_a = rsi_wilder(close, period)[1:], close[1:]
+    entries, exits, sides = backtest_mode(rsi_a, MODE_IDS["mean_reversion"], lower, 0, exit_level)
+    return float((sides * (close_a[exits] / close_a[entries] - 1) * 100).sum())
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _sensitivity_cached(close_bytes: bytes, exit_level: int) -> np.ndarray:
+    # Total PnL (%) per (RSI period, lower threshold); threads overlap since the kernels drop the GIL
+    close = np.frombuffer(close_bytes, dtype=np.float64)
+    grid = [(p, lo) for p in SWEEP_RSI_PERIODS for lo in SWEEP_LOWER_THRESHOLDS]
+    pnl = Parallel(n_jobs=-1, backend="threading")(
+        delayed(_sweep_one)(close, p, lo, exit_level) for p, lo in grid
+    )
+    return np.array(pnl).reshape(len(SWEEP_RSI_PERIODS), len(SWEEP_LOWER_THRESHOLDS))
+
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def _to_csv(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode()
+
+
+def _downsampled(index, values):
+    # Trade markers stay full resolution; only the dense line traces are thinned
+    values = values.to_numpy(dtype=np.float64)
+    keep = lttb(index.asi8.astype(np.float64), values, CHART_POINTS)
+    return index[keep], values[keep]
+
+
 # -------------------------
 # UI
 # -------------------------
@@ -104,17 +210,20 @@ Evaluates **3 RSI-based strategies**:
 - *Trend-following RSI:* Enter on RSI cross of 50
 """)
 
+_warm_kernels()
+
 status_msg = st.empty()
-status_msg.info("Fetching data...")
 
 try:
-    df = fetch_data_yfinance(market, period=period, interval=timeframe)
+    with st.spinner("Fetching data..."):
+        df = fetch_data_yfinance(market, period=period, interval=timeframe, cache_hour=_current_fetch_hour())
 except Exception as e:
     st.error(f"Data fetch failed: {e}")
     st.stop()
 
-df["rsi"] = rsi(df["close"], period=rsi_period)
-df = df.dropna().reset_index(drop=True)
+raw_close_bytes = df["close"].to_numpy(dtype=np.float64).tobytes()
+df["rsi"] = _rsi_cached(raw_close_bytes, len(df), rsi_period)
+df = df.dropna()
 
 strategies = [
     {"name": "Mean Reversion", "mode": "mean_reversion", "lower": lower_thresh, "exit_level": exit_level},
@@ -122,11 +231,35 @@ strategies = [
     {"name": "Trend-follow RSI", "mode": "trend_follow_rsi"},
 ]
 
+# Convert once; every backtest (and its cache key) reuses the same buffers
+close_arr = df["close"].to_numpy(dtype=np.float64)
+rsi_arr = df["rsi"].to_numpy(dtype=np.float64)
+close_bytes, rsi_bytes = close_arr.tobytes(), rsi_arr.tobytes()
+
 results, trades_tables = {}, {}
-for s in strategies:
-    summary, trades_df = backtest_simple_strategy(df, df["rsi"], s)
-    results[s["name"]] = summary
-    trades_tables[s["name"]] = trades_df
+# Strategies are independent; workers get the script context so cache lookups work
+with ThreadPoolExecutor(
+    max_workers=3, initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx())
+) as ex:
+    # Only the thresholds a mode reads go into the key; the rest stay at 0
+    futs = {
+        s["name"]: ex.submit(
+            _bt_cached,
+            close_bytes,
+            rsi_bytes,
+            s["mode"],
+            s.get("lower", 0),
+            s.get("upper", 0),
+            s.get("exit_level", 0),
+        )
+        for s in strategies
+    }
+for name, fut in futs.items():
+    summary, trade_events = fut.result()
+    results[name] = summary
+    # Summaries are eager; a trades table is only built when the chart or the table
+    # picker asks for it, and memoised so both can share one build
+    trades_tables[name] = cache(partial(_trades_frame, df.index, close_arr, *trade_events))
 
 regime, metrics = tag_market_regime(df)
 status_msg.success("Analysis complete.")
@@ -181,88 +314,126 @@ with col3:
     st.subheader("Data Info")
     st.write(f"Timeframe: {timeframe}")
     st.write(f"Bars: {len(df)}")
-    st.write(f"From {df['timestamp'].iloc[0]} to {df['timestamp'].iloc[-1]}")
+    st.write(f"From {df.index[0]} to {df.index[-1]}")
 
 st.markdown("---")
 
 # -------------------------
-# Strategy Result Boxes
+# Price Chart + Markers
 # -------------------------
-strat_cols = st.columns(3)
-for i, s in enumerate(strategies):
-    name = s["name"]
-    summ = results[name]
-    with strat_cols[i]:
-        st.metric(label=name + " — Total Trades", value=int(summ["total_trades"]))
-        st.metric(label="Total PnL (%)", value=f"{summ['total_pnl_pct']:.2f}")
-        st.metric(label="Win Rate (%)", value=f"{summ['win_rate_pct']:.2f}")
-        st.write(f"Avg trade PnL (%): {summ['avg_pnl_pct']:.2f}")
-        st.write(f"Max Drawdown (%): {summ['max_drawdown_pct']:.2f}")
-
-st.markdown("### Price & RSI Chart (Interactive)")
+@st.fragment
+def render_price_chart(df, strategies, trades_tables):
+    # Own fragment: changing the marker strategy only rebuilds this chart
+    fig = go.Figure()
+    x, y = _downsampled(df.index, df["close"])
+    fig.add_trace(go.Scattergl(x=x, y=y, name="Price (Close)"))
+    fig.update_layout(height=500, xaxis_title="Time", yaxis_title="Price")
+
+    selected_strategy = st.selectbox("Select strategy for trade markers", [s["name"] for s in strategies])
+    trades_df_plot = trades_tables[selected_strategy]()
+    if not trades_df_plot.empty:
+        fig.add_trace(go.Scattergl(
+            x=trades_df_plot["entry_time"],
+            y=trades_df_plot["entry_price"],
+            mode="markers",
+            marker=dict(symbol="triangle-up", size=10, color="green"),
+            name="Entries",
+        ))
+        fig.add_trace(go.Scattergl(
+            x=trades_df_plot["exit_time"],
+            y=trades_df_plot["exit_price"],
+            mode="markers",
+            marker=dict(symbol="triangle-down", size=10, color="red"),
+            name="Exits",
+        ))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def render_trades_table(strategies, trades_tables, market, timeframe):
+    # One table at a time: only the picked strategy's trades are built, and
+    # switching strategy reruns just this fragment
+    name = st.radio("Strategy", [s["name"] for s in strategies], horizontal=True, key="trades_table_strategy")
+    tdf = trades_tables[name]()
+    if tdf.empty:
+        st.info("No trades for this strategy with current parameters.")
+    else:
+        st.dataframe(
+            tdf[["entry_time", "exit_time", "side", "entry_price", "exit_price", "pnl_pct", "cumulative_pnl_pct"]]
+        )
+        st.download_button(
+            label=f"Download {name} Trades CSV",
+            data=_to_csv(tdf),
+            file_name=f"{market}_{timeframe}_{name.replace(' ','_')}_trades.csv",
+            mime="text/csv",
+        )
+
 
 # -------------------------
-# Price Chart + Markers
+# Strategy Results
 # -------------------------
-fig = go.Figure()
-fig.add_trace(go.Scatter(x=df["timestamp"], y=df["close"], name="Price (Close)"))
-fig.update_layout(height=500, xaxis_title="Time", yaxis_title="Price")
-
-selected_strategy = st.selectbox("Select strategy for trade markers", [s["name"] for s in strategies])
-trades_df_plot = trades_tables[selected_strategy]
-if not trades_df_plot.empty:
-    fig.add_trace(go.Scatter(
-        x=trades_df_plot["entry_time"],
-        y=trades_df_plot["entry_price"],
-        mode="markers",
-        marker=dict(symbol="triangle-up", size=10, color="green"),
-        name="Entries",
-    ))
-    fig.add_trace(go.Scatter(
-        x=trades_df_plot["exit_time"],
-        y=trades_df_plot["exit_price"],
-        mode="markers",
-        marker=dict(symbol="triangle-down", size=10, color="red"),
-        name="Exits",
-    ))
-st.plotly_chart(fig, use_container_width=True)
-
-# RSI Panel
-fig2 = go.Figure()
-fig2.add_trace(go.Scatter(x=df["timestamp"], y=df["rsi"], name="RSI"))
-fig2.add_hline(y=lower_thresh, line_dash="dash", annotation_text="Lower")
-fig2.add_hline(y=upper_thresh, line_dash="dash", annotation_text="Upper")
-fig2.add_hline(y=exit_level, line_dash="dot", annotation_text="Exit")
-fig2.update_layout(height=250, yaxis_title="RSI")
-st.plotly_chart(fig2, use_container_width=True)
+@st.fragment
+def render_results(df, strategies, results, trades_tables, lower_thresh, upper_thresh, exit_level, market, timeframe):
+    # Strategy boxes, chart and trades tables rerun on their own, not the whole script
+    strat_cols = st.columns(3)
+    for i, s in enumerate(strategies):
+        name = s["name"]
+        summ = results[name]
+        with strat_cols[i]:
+            st.metric(label=name + " — Total Trades", value=int(summ["total_trades"]))
+            st.metric(label="Total PnL (%)", value=f"{summ['total_pnl_pct']:.2f}")
+            st.metric(label="Win Rate (%)", value=f"{summ['win_rate_pct']:.2f}")
+            st.write(f"Avg trade PnL (%): {summ['avg_pnl_pct']:.2f}")
+            st.write(f"Max Drawdown (%): {summ['max_drawdown_pct']:.2f}")
+
+    st.markdown("### Price & RSI Chart (Interactive)")
+
+    render_price_chart(df, strategies, trades_tables)
+
+    # RSI Panel
+    fig2 = go.Figure()
+    x, y = _downsampled(df.index, df["rsi"])
+    fig2.add_trace(go.Scattergl(x=x, y=y, name="RSI"))
+    fig2.add_hline(y=lower_thresh, line_dash="dash", annotation_text="Lower")
+    fig2.add_hline(y=upper_thresh, line_dash="dash", annotation_text="Upper")
+    fig2.add_hline(y=exit_level, line_dash="dot", annotation_text="Exit")
+    fig2.update_layout(height=250, yaxis_title="RSI")
+    st.plotly_chart(fig2, use_container_width=True)
+
+    # -------------------------
+    # Trades Tables (no disk writes)
+    # -------------------------
+    st.markdown("### Trades Table and Downloads")
+    render_trades_table(strategies, trades_tables, market, timeframe)
+
+
+render_results(df, strategies, results, trades_tables, lower_thresh, upper_thresh, exit_level, market, timeframe)
 
 # -------------------------
-# Trades Tables (no disk writes)
+# Parameter Sensitivity
 # -------------------------
-st.markdown("### Trades Table and Downloads")
-tabs = st.tabs([s["name"] for s in strategies])
-for idx, s in enumerate(strategies):
-    with tabs[idx]:
-        tdf = trades_tables[s["name"]]
-        if tdf.empty:
-            st.info("No trades for this strategy with current parameters.")
-        else:
-            st.dataframe(
-                tdf[["entry_time", "exit_time", "side", "entry_price", "exit_price", "pnl_pct", "cumulative_pnl_pct"]]
-            )
-            st.download_button(
-                label=f"Download {s['name']} Trades CSV",
-                data=tdf.to_csv(index=False),
-                file_name=f"{market}_{timeframe}_{s['name'].replace(' ','_')}_trades.csv",
-                mime="text/csv",
-            )
+st.markdown("### Mean Reversion Parameter Sensitivity")
+sensitivity = _sensitivity_cached(raw_close_bytes, exit_level)
+fig3 = go.Figure(go.Heatmap(
+    z=sensitivity,
+    x=[str(lo) for lo in SWEEP_LOWER_THRESHOLDS],
+    y=[str(p) for p in SWEEP_RSI_PERIODS],
+    text=np.round(sensitivity, 2),
+    texttemplate="%{text}",
+    colorscale="RdYlGn",
+    zmid=0,
+    colorbar=dict(title="Total PnL (%)"),
+))
+fig3.update_layout(height=300, xaxis_title="Lower Threshold (Buy)", yaxis_title="RSI Period")
+st.plotly_chart(fig3, use_container_width=True)
+st.caption(f"Total PnL (%) of Mean Reversion per RSI period and buy threshold, exiting at RSI {exit_level}.")
 
 st.markdown("---")
 st.write("**Notes:**")
 st.write("""
-- Uses live data via Yahoo Finance (no local storage).  
+- Uses live data via Yahoo Finance (cached locally for up to an hour).  
 - Slippage, commissions, and execution constraints are NOT modeled.  
 - Strategy logic is simplified for demonstration.  
-- Safe for recruiters and portfolio viewers — no files are written locally.
+- Safe for recruiters and portfolio viewers — nothing is written locally beyond Streamlit's data cache.
 - To see more of my work or get in touch, visit my wesbite at: https://dannypartington.github.io/Analytics-Portfolio/
 """)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Checks that fetch_data_yfinance is served from cache on repeat runs.
+
+yfinance.download is replaced by a fake that counts calls, and the app is
+driven through Streamlit's AppTest, so no network access is needed.
+"""
+
+import sys
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(APP_DIR))  # `streamlit run` does this for app.py's imports
+
+
+@pytest.fixture
+def download_calls():
+    calls = []
+
+    def fake_download(ticker, **kwargs):
+        calls.append((ticker, kwargs.get("period"), kwargs.get("interval")))
+        n = 500
+        idx = pd.date_range("2024-01-01", periods=n, freq="h", tz="UTC")
+        close = 100 + np.cumsum(np.random.default_rng(0).standard_normal(n))
+        return pd.DataFrame(
+            {"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": np.arange(n)},
+            index=idx,
+        )
+
+    st.cache_data.clear()  # also drops pickles persisted to disk by earlier runs
+    with mock.patch("yfinance.download", fake_download):
+        yield calls
+    st.cache_data.clear()
+
+
+def _run_app():
+    at = AppTest.from_file(str(APP_DIR / "app.py"), default_timeout=120)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def test_repeat_fetch_is_a_cache_hit(download_calls):
+    at = _run_app()
+    assert len(download_calls) == 1
+
+    at.run()
+    assert not at.exception
+    assert len(download_calls) == 1
+
+
+def test_new_ticker_misses_the_cache(download_calls):
+    at = _run_app()
+    at.sidebar.selectbox[0].select("QQQ").run()
+    assert not at.exception
+    assert [c[0] for c in download_calls] == ["SPY", "QQQ"]
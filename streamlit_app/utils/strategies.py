@@ -85,6 +85,9 @@ def backtest_simple_strategy(df, rsi_series, strategy_cfg):
             position, entry_idx = None, None
 
     trades_df = compute_returns_from_trades(trades, df)
+    return summarize_trades(trades_df), trades_df
+
+def summarize_trades(trades_df):
     summary = {
         'total_trades': len(trades_df),
         'total_pnl_pct': trades_df['pnl_pct'].sum() if not trades_df.empty else 0.0,
@@ -97,7 +100,7 @@ def backtest_simple_strategy(df, rsi_series, strategy_cfg):
         peak = equity.cummax()
         drawdowns = (equity - peak) / peak
         summary['max_drawdown_pct'] = drawdowns.min() * 100
-    return summary, trades_df
+    return summary
 
 def tag_market_regime(df):
     import numpy as np